@@ -1,4 +1,5 @@
-from typing import List
+from typing import List, Optional
+import numpy as np
 from ehr_models import EHRRecord, QualityReport
 from validators import EHRValidator
 from outlier_detector import OutlierDetector
@@ -10,22 +11,26 @@ class EHRQualityAuditor:
         self.outlier_detector = OutlierDetector()
         self.quality_scorer = QualityScorer()
     
-    def process_records(self, records: List[EHRRecord]) -> QualityReport:
+    def process_records(self, records: List[EHRRecord], features: Optional[np.ndarray] = None) -> QualityReport:
         # Train outlier detector
-        self.outlier_detector.train(records)
+        self.outlier_detector.train(records, features)
         
-        # Collect all validation results
+        # Collect all validation results, counting the valid ones as they are added
         validation_results = []
+        valid_count = 0
         
         # Perform basic validation
+        self.validator.start_batch()
         for record in records:
-            validation_results.extend(self.validator.validate_record(record))
+            results = self.validator.validate_record(record)
+            validation_results.extend(results)
+            valid_count += sum(result.is_valid for result in results)
         
-        # Detect outliers
-        validation_results.extend(self.outlier_detector.detect_outliers(records))
+        # Detect outliers; every outlier result is an invalid finding
+        validation_results.extend(self.outlier_detector.detect_outliers(records, features))
         
         # Generate quality report
-        quality_report = self.quality_scorer.calculate_scores(records, validation_results)
+        quality_report = self.quality_scorer.calculate_scores(records, validation_results, valid_count)
         
         return quality_report
 
@@ -54,10 +59,11 @@ Validation Issues:
             if not result.is_valid:
                 issues_by_severity[result.severity].append(result)
         
+        # Collect the issue lines and join once rather than growing the string per issue
+        sections = [summary]
         for severity in ["high", "medium", "low"]:
             if issues_by_severity[severity]:
-                summary += f"\n{severity.upper()} Severity Issues:\n"
-                for issue in issues_by_severity[severity]:
-                    summary += f"- {issue.field_name}: {issue.error_message}\n"
+                sections.append(f"\n{severity.upper()} Severity Issues:\n")
+                sections.extend(f"- {issue.field_name}: {issue.error_message}\n" for issue in issues_by_severity[severity])
         
-        return summary
\ No newline at end of file
+        return "".join(sections)
\ No newline at end of file
@@ -1,5 +1,5 @@
 from datetime import datetime
-from ehr_models import EHRRecord
+from ehr_models import EHRRecord, EHRRecordFast
 from ehr_quality_auditor import EHRQualityAuditor
 from outlier_detector import OutlierDetector
 from validators import EHRValidator
@@ -50,7 +50,8 @@ def run_comprehensive_audit():
 
     # Create sample records
     print("Creating sample records...")
-    records = create_sample_records()
+    # Validate through the Pydantic models, then hand slotted records to the audit components
+    records = [EHRRecordFast.from_record(record) for record in create_sample_records()]
     print(f"Created {len(records)} test records\n")
 
     # Initialize components
@@ -1,19 +1,22 @@
 import numpy as np
 from sklearn.ensemble import IsolationForest
-from typing import List, Dict
+from typing import List, Dict, Optional
 from ehr_models import EHRRecord, ValidationResult
 
 class OutlierDetector:
     def __init__(self):
-        self.isolation_forest = IsolationForest(contamination=0.1, random_state=42)
+        # 'auto' subsamples min(256, n) rows per tree, so fit cost stays flat as N grows; trees are built in parallel
+        self.isolation_forest = IsolationForest(contamination=0.1, max_samples='auto', n_jobs=-1, random_state=42)
         
-    def train(self, records: List[EHRRecord]):
-        # Extract numerical features for training
-        features = self._extract_features(records)
+    def train(self, records: List[EHRRecord], features: Optional[np.ndarray] = None):
+        # Extract numerical features for training unless the loader already built them
+        if features is None:
+            features = self._extract_features(records)
         self.isolation_forest.fit(features)
     
-    def detect_outliers(self, records: List[EHRRecord]) -> List[ValidationResult]:
-        features = self._extract_features(records)
+    def detect_outliers(self, records: List[EHRRecord], features: Optional[np.ndarray] = None) -> List[ValidationResult]:
+        if features is None:
+            features = self._extract_features(records)
         predictions = self.isolation_forest.predict(features)
         
         results = []
@@ -39,4 +42,5 @@ class OutlierDetector:
                 len(record.diagnosis_codes)
             ]
             features.append(record_features)
-        return np.array(features)
\ No newline at end of file
+        # IsolationForest fits in float32 anyway; converting here avoids a float64 intermediate copy
+        return np.asarray(features, dtype=np.float32)
\ No newline at end of file
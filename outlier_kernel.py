@@ -0,0 +1,17 @@
+import numpy as np
+from numba import njit, prange
+
+@njit(parallel=True, fastmath=True, cache=True)
+def flag_outliers_kernel(vitals: np.ndarray, mean: np.ndarray, std: np.ndarray) -> np.ndarray:
+    """Mark rows with any vital sign more than 2 standard deviations from the mean, in parallel"""
+    n, d = vitals.shape
+    out = np.empty(n, np.bool_)
+    for i in prange(n):
+        flag = False
+        for j in range(d):
+            # Most rows are inliers, so stop at the first column that exceeds the threshold
+            if abs(vitals[i, j] - mean[j]) > 2 * std[j]:
+                flag = True
+                break
+        out[i] = flag
+    return out
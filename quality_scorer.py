@@ -1,12 +1,12 @@
-from typing import List
+from typing import List, Optional
 from ehr_models import EHRRecord, ValidationResult, QualityReport
 from datetime import datetime
 
 class QualityScorer:
-    def calculate_scores(self, records: List[EHRRecord], validation_results: List[ValidationResult]) -> QualityReport:
+    def calculate_scores(self, records: List[EHRRecord], validation_results: List[ValidationResult], valid_count: Optional[int] = None) -> QualityReport:
         completeness_score = self._calculate_completeness(records)
         consistency_score = self._calculate_consistency(records)
-        accuracy_score = self._calculate_accuracy(validation_results)
+        accuracy_score = self._calculate_accuracy(validation_results, valid_count)
         
         return QualityReport(
             completeness_score=completeness_score,
@@ -58,9 +58,11 @@ class QualityScorer:
             
         return True
     
-    def _calculate_accuracy(self, validation_results: List[ValidationResult]) -> float:
+    def _calculate_accuracy(self, validation_results: List[ValidationResult], valid_count: Optional[int] = None) -> float:
         if not validation_results:
             return 100.0
-            
-        valid_results = sum(1 for result in validation_results if result.is_valid)
-        return (valid_results / len(validation_results)) * 100
\ No newline at end of file
+        
+        # Callers that counted valid results while collecting them skip the extra pass
+        if valid_count is None:
+            valid_count = sum(1 for result in validation_results if result.is_valid)
+        return (valid_count / len(validation_results)) * 100
\ No newline at end of file
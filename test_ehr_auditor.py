@@ -1,54 +1,144 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import csv
-from ehr_models import EHRRecord
+from ehr_models import EHRRecordFast, extract_numeric_columns, find_format_violations, find_range_violations, split_list_column
 from ehr_quality_auditor import EHRQualityAuditor
+from validators import EHRValidator
 
-def load_ehr_data(file_path: str) -> list:
+def load_ehr_data(file_path: str) -> tuple:
     """
-    Load EHR data from CSV file and convert to EHRRecord objects
+    Load EHR data from CSV file and convert to EHRRecordFast objects,
+    along with the outlier feature matrix for the loaded records
     """
     try:
         # Read CSV file
         df = pd.read_csv(file_path)
         records = []
+        # One load timestamp shared by every record instead of a clock read per row
+        loaded_at = datetime.now()
+
+        # Range-check the numeric columns and format-check the string columns in one pass, and skip rows that fail
+        columns = extract_numeric_columns(df)
+        violations = {**find_range_violations(columns), **find_format_violations(df)}
+        invalid_mask = np.logical_or.reduce(list(violations.values()))
+        for idx in np.flatnonzero(invalid_mask):
+            failed_checks = [name for name, mask in violations.items() if mask[idx]]
+            print(f"Error processing row: row {idx + 1} failed checks: {', '.join(failed_checks)}")
+
+        if 'notes' in df.columns:
+            notes = [str(value) if present else None for value, present in zip(df['notes'], df['notes'].notna())]
+        else:
+            notes = [None] * len(df)
+
+        medication_lists = split_list_column(df, 'medications')
+        diagnosis_lists = split_list_column(df, 'diagnosis_codes')
+
+        # Every column is listed in the order the loop below unpacks it, so rows come back as plain tuples from itertuples
+        # String and list columns stay object dtype so None is not turned into NaN
+        prepared = pd.DataFrame({
+            'patient_id': pd.Series(df['patient_id'].astype(str).to_list(), dtype=object),
+            'systolic_bp': columns['systolic_bp'],
+            'diastolic_bp': columns['diastolic_bp'],
+            'heart_rate': columns['heart_rate'],
+            'temperature': columns['temperature'],
+            'respiratory_rate': columns['respiratory_rate'],
+            'age': columns['age'],
+            'glucose': columns['glucose'],
+            'cholesterol': columns['cholesterol'],
+            'gender': pd.Series(df['gender'].astype(str).to_list(), dtype=object),
+            'race': pd.Series(df['race'].astype(str).to_list(), dtype=object),
+            'medications': pd.Series(medication_lists, dtype=object),
+            'diagnosis_codes': pd.Series(diagnosis_lists, dtype=object),
+            'notes': pd.Series(notes, dtype=object)
+        })
         
-        for _, row in df.iterrows():
-            try:
-                # Convert row data to EHRRecord format
-                # Adjust these field mappings according to your CSV structure
-                record = EHRRecord(
-                    patient_id=str(row.get('patient_id', '')),
-                    timestamp=datetime.now(),  # Use actual timestamp from CSV if available
-                    vital_signs={
-                        "blood_pressure_systolic": float(row.get('systolic_bp', 0)),
-                        "blood_pressure_diastolic": float(row.get('diastolic_bp', 0)),
-                        "heart_rate": float(row.get('heart_rate', 0)),
-                        "temperature": float(row.get('temperature', 0)),
-                        "respiratory_rate": float(row.get('respiratory_rate', 0))
-                    },
-                    medications=str(row.get('medications', '')).split(',') if pd.notna(row.get('medications')) else [],
-                    diagnosis_codes=str(row.get('diagnosis_codes', '')).split(',') if pd.notna(row.get('diagnosis_codes')) else [],
-                    lab_results={
-                        "glucose": float(row.get('glucose', 0)),
-                        "cholesterol": float(row.get('cholesterol', 0))
-                    },
-                    demographics={
-                        "age": int(row.get('age', 0)),
-                        "gender": str(row.get('gender', '')),
-                        "race": str(row.get('race', ''))
-                    },
-                    notes=str(row.get('notes', '')) if pd.notna(row.get('notes')) else None
-                )
-                records.append(record)
-            except Exception as e:
-                print(f"Error processing row: {e}")
-                continue
+        # Every model constraint is covered by the masks above, so rows go straight into slotted records
+        for (patient_id, systolic_bp, diastolic_bp, heart_rate, temperature, respiratory_rate,
+                age, glucose, cholesterol, gender, race, medications, diagnosis_codes, note) in \
+                prepared[~invalid_mask].itertuples(index=False, name=None):
+            # Convert row data to EHRRecordFast format
+            # Adjust these field mappings according to your CSV structure
+            records.append(EHRRecordFast(
+                patient_id=patient_id,
+                timestamp=loaded_at,  # Use actual timestamp from CSV if available
+                vital_signs={
+                    "blood_pressure_systolic": systolic_bp,
+                    "blood_pressure_diastolic": diastolic_bp,
+                    "heart_rate": heart_rate,
+                    "temperature": temperature,
+                    "respiratory_rate": respiratory_rate
+                },
+                medications=medications,
+                diagnosis_codes=diagnosis_codes,
+                lab_results={
+                    "glucose": glucose,
+                    "cholesterol": cholesterol
+                },
+                demographics={
+                    "age": int(age),
+                    "gender": gender,
+                    "race": race
+                },
+                notes=note
+            ))
+
+        # Same column order as OutlierDetector._extract_features
+        medication_counts = np.fromiter(map(len, medication_lists), dtype=np.float32, count=len(df))
+        diagnosis_counts = np.fromiter(map(len, diagnosis_lists), dtype=np.float32, count=len(df))
+        valid_mask = ~invalid_mask
+        features = np.asfortranarray(np.column_stack([
+            columns['systolic_bp'][valid_mask],
+            columns['diastolic_bp'][valid_mask],
+            columns['heart_rate'][valid_mask],
+            columns['temperature'][valid_mask],
+            medication_counts[valid_mask],
+            diagnosis_counts[valid_mask]
+        ]), dtype=np.float32)
                 
-        return records
+        return records, features
     except Exception as e:
         print(f"Error loading CSV file: {e}")
-        return []
+        return [], None
+
+def test_validate_batch_matches_validate_record():
+    """validate_batch must report the same findings as validate_record run on each row"""
+    df = pd.DataFrame({
+        'patient_id': ['P000001', 'X12', 'P000003', 'P000004'],
+        'systolic_bp': [120.0, 250.0, 130.0, 110.0],
+        'diastolic_bp': [80.0, 90.0, 85.0, 70.0],
+        'heart_rate': [72.0, 30.0, 80.0, 65.0],
+        'temperature': [36.6, 37.0, 36.8, np.nan],
+        'respiratory_rate': [16.0, 18.0, 50.0, 14.0],
+        'age': [45.0, 60.0, 30.0, 52.0],
+        'gender': ['M', 'F', 'M', 'F'],
+        'race': ['Asian', 'White', 'Black', 'Other'],
+        'diagnosis_codes': ['E11.9,I10', 'bad', None, 'J45,12X']
+    })
+    validator = EHRValidator()
+    expected = []
+    for row in df.itertuples(index=False):
+        expected.extend(validator.validate_record(EHRRecordFast(
+            patient_id=row.patient_id,
+            timestamp=datetime.now(),
+            vital_signs={
+                "blood_pressure_systolic": row.systolic_bp,
+                "blood_pressure_diastolic": row.diastolic_bp,
+                "heart_rate": row.heart_rate,
+                "temperature": row.temperature,
+                "respiratory_rate": row.respiratory_rate
+            },
+            diagnosis_codes=row.diagnosis_codes.split(',') if isinstance(row.diagnosis_codes, str) else [],
+            demographics={"age": int(row.age), "gender": row.gender, "race": row.race}
+        )))
+
+    def findings(results):
+        return sorted((r.field_name, r.error_message, r.severity) for r in results)
+
+    assert findings(validator.validate_batch(df)) == findings(expected)
+    # Without the column there are no codes to check, rather than a KeyError
+    assert findings(validator.validate_batch(df.drop(columns='diagnosis_codes'))) == \
+        findings(r for r in expected if r.field_name != 'diagnosis_codes')
 
 def run_test():
     print("EHR Data Quality Audit Test")
@@ -59,7 +149,7 @@ def run_test():
     
     # Load data from your CSV file
     file_path = r"C:\Users\SHRAVINYA\Downloads\EHR.csv"
-    records = load_ehr_data(file_path)
+    records, features = load_ehr_data(file_path)
     
     if not records:
         print("No records loaded. Please check the CSV file format.")
@@ -72,7 +162,7 @@ def run_test():
     
     # Process records and get quality report
     print("\nAnalyzing data quality...")
-    quality_report = auditor.process_records(records)
+    quality_report = auditor.process_records(records, features)
     
     # Print detailed report
     print("\nQuality Analysis Results:")
@@ -1,7 +1,17 @@
-from typing import List
+from typing import List, Set
+import functools
 import re
 from datetime import datetime
-from ehr_models import EHRRecord, ValidationResult
+import numpy as np
+import pandas as pd
+from ehr_models import EHRRecord, ValidationResult, ICD10_CODE_PATTERN, PATIENT_ID_PATTERN, VITAL_SIGN_COLUMNS, extract_numeric_columns
+
+ICD10_PATTERN = re.compile(ICD10_CODE_PATTERN)
+
+@functools.lru_cache(maxsize=4096)
+def _code_is_valid(code: str) -> bool:
+    # The same ICD-10 codes recur across records, so only run the regex once per distinct code
+    return bool(ICD10_PATTERN.match(code))
 
 class EHRValidator:
     def __init__(self):
@@ -12,6 +22,18 @@ class EHRValidator:
             "temperature": (35, 42),
             "respiratory_rate": (8, 40)
         }
+        self._pid_re = re.compile(PATIENT_ID_PATTERN)
+        # Longitudinal data repeats patient IDs, so remember the ones that already matched within a batch
+        self._valid_pids: Set[str] = set()
+        self._icd_re = ICD10_PATTERN
+        # Range bounds as arrays in VITAL_SIGN_COLUMNS order for whole-matrix checks
+        self._vital_names = list(self.vital_signs_ranges)
+        self._mins = np.array([low for low, _ in self.vital_signs_ranges.values()], dtype=np.float32)
+        self._maxs = np.array([high for _, high in self.vital_signs_ranges.values()], dtype=np.float32)
+    
+    def start_batch(self):
+        """Forget the patient IDs remembered for the previous batch so the set never outgrows one batch"""
+        self._valid_pids.clear()
     
     def validate_record(self, record: EHRRecord) -> List[ValidationResult]:
         results = []
@@ -30,30 +52,72 @@ class EHRValidator:
         
         return results
     
+    def validate_batch(self, df: pd.DataFrame) -> List[ValidationResult]:
+        """Validate the patient_id, vital sign and diagnosis_codes columns of a CSV-shaped frame in one pass"""
+        results = []
+        
+        # Validate patient ID format for the whole column
+        bad_pid = ~df['patient_id'].astype(str).str.match(self._pid_re).to_numpy()
+        for _ in np.flatnonzero(bad_pid):
+            results.append(self._invalid_patient_id_result())
+        
+        # Validate all vital signs as one matrix, building results only for the out-of-range cells
+        columns = extract_numeric_columns(df)
+        vitals = np.column_stack([columns[name] for name in VITAL_SIGN_COLUMNS])
+        _, col_bad = self.validate_vitals_batch(vitals)
+        for row, col in np.argwhere(col_bad):
+            name = self._vital_names[col]
+            results.append(self._vital_sign_result(name, vitals[row, col], *self.vital_signs_ranges[name]))
+        
+        # Validate every diagnosis code across all rows at once; a frame without the column has no codes
+        if 'diagnosis_codes' in df.columns:
+            codes = df['diagnosis_codes'].dropna().astype(str).str.split(',').explode()
+            bad_codes = codes[~codes.str.match(self._icd_re, na=False).to_numpy()]
+            for code in bad_codes:
+                results.append(self._invalid_code_result(code))
+        
+        return results
+    
+    def validate_vitals_batch(self, vitals: np.ndarray):
+        """Range-check an (n, 5) vitals matrix; returns the per-row and per-cell out-of-range masks"""
+        # Written as a negated in-range test so missing (NaN) readings are flagged too
+        col_bad = ~((vitals >= self._mins) & (vitals <= self._maxs))
+        row_bad = col_bad.any(axis=1)
+        return row_bad, col_bad
+    
     def _validate_patient_id(self, patient_id: str) -> List[ValidationResult]:
-        if not re.match(r'^P\d{6}$', patient_id):
-            return [ValidationResult(
-                field_name="patient_id",
-                is_valid=False,
-                error_message="Patient ID must be in format P followed by 6 digits",
-                severity="high"
-            )]
+        if patient_id in self._valid_pids:
+            return []
+        if not self._pid_re.match(patient_id):
+            return [self._invalid_patient_id_result()]
+        self._valid_pids.add(patient_id)
         return []
     
+    def _invalid_patient_id_result(self) -> ValidationResult:
+        return ValidationResult(
+            field_name="patient_id",
+            is_valid=False,
+            error_message="Patient ID must be in format P followed by 6 digits",
+            severity="high"
+        )
+    
     def _validate_vital_signs(self, vital_signs: dict) -> List[ValidationResult]:
         results = []
         for name, value in vital_signs.items():
             if name in self.vital_signs_ranges:
                 min_val, max_val = self.vital_signs_ranges[name]
                 if not min_val <= value <= max_val:
-                    results.append(ValidationResult(
-                        field_name=f"vital_signs.{name}",
-                        is_valid=False,
-                        error_message=f"{name} value {value} is outside normal range ({min_val}-{max_val})",
-                        severity="medium"
-                    ))
+                    results.append(self._vital_sign_result(name, value, min_val, max_val))
         return results
     
+    def _vital_sign_result(self, name: str, value: float, min_val: float, max_val: float) -> ValidationResult:
+        return ValidationResult(
+            field_name=f"vital_signs.{name}",
+            is_valid=False,
+            error_message=f"{name} value {value} is outside normal range ({min_val}-{max_val})",
+            severity="medium"
+        )
+    
     def _validate_demographics(self, demographics: dict) -> List[ValidationResult]:
         required_fields = ["age", "gender", "race"]
         results = []
@@ -70,14 +134,16 @@ class EHRValidator:
     
     def _validate_diagnosis_codes(self, codes: List[str]) -> List[ValidationResult]:
         results = []
-        icd10_pattern = r'^[A-Z]\d{2}(\.\d+)?$'
         
         for code in codes:
-            if not re.match(icd10_pattern, code):
-                results.append(ValidationResult(
-                    field_name="diagnosis_codes",
-                    is_valid=False,
-                    error_message=f"Invalid ICD-10 code format: {code}",
-                    severity="high"
-                ))
-        return results
\ No newline at end of file
+            if not _code_is_valid(code):
+                results.append(self._invalid_code_result(code))
+        return results
+    
+    def _invalid_code_result(self, code: str) -> ValidationResult:
+        return ValidationResult(
+            field_name="diagnosis_codes",
+            is_valid=False,
+            error_message=f"Invalid ICD-10 code format: {code}",
+            severity="high"
+        )
\ No newline at end of file